@@ -0,0 +1,58 @@
+# Host-side (CPython) converter of .svgpath files into the binary .svgbin
+# format drawn by draw_svg_path.draw_svgbin():
+#
+#   python3 compile_svgpath.py qrlink.svgpath qrlink.svgbin
+#
+# Every closed subpath becomes one record of little-endian int16 words:
+# x, y, n, followed by n coordinates (x/y pairs relative to x, y), so the
+# device hands them to fbuf.poly without any text parsing.
+
+import re
+import struct
+import sys
+
+
+TOKENS = re.compile(rb"[zZmMlL]|-?[0-9]+")
+
+
+def compile_svgpath(text):
+    words = []
+    command = None
+    position = [0, 0]
+    position_counter = 0
+    command_args = []
+
+    for token in TOKENS.findall(text):
+        if token in (b"z", b"Z"):
+            if command == b"l":
+                # relative lineto: accumulate offsets into coordinates
+                prev = [0, 0]
+                for i, value in enumerate(command_args):
+                    prev[i % 2] += value
+                    command_args[i] = prev[i % 2]
+            words.extend((position[0], position[1], len(command_args)))
+            words.extend(command_args)
+            position_counter = 0
+            command_args = []
+            command = token
+        elif token.isalpha():
+            command = token
+        elif command == b"M":
+            if position_counter < 2:
+                position[position_counter] = int(token)
+                position_counter += 1
+        elif command in (b"l", b"L"):
+            command_args.append(int(token))
+
+    return struct.pack("<%dh" % len(words), *words)
+
+
+def main(svgpathfile, svgbinfile):
+    with open(svgpathfile, "rb") as infile:
+        data = compile_svgpath(infile.read())
+    with open(svgbinfile, "wb") as outfile:
+        outfile.write(data)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1], sys.argv[2])
@@ -1,13 +1,14 @@
 import array
-import gc
+import micropython
+from micropython import const
 
 
-COMMAND_CLOSE = b"z"
-COMMAND_CLOSE_ABS = b"Z"
-COMMAND_MOVE = b"m"
-COMMAND_MOVE_ABS = b"M"
-COMMAND_LINETO = b"l"
-COMMAND_LINETO_ABS = b"L"
+COMMAND_CLOSE = const(0x7A)  # "z"
+COMMAND_CLOSE_ABS = const(0x5A)  # "Z"
+COMMAND_MOVE = const(0x6D)  # "m"
+COMMAND_MOVE_ABS = const(0x4D)  # "M"
+COMMAND_LINETO = const(0x6C)  # "l"
+COMMAND_LINETO_ABS = const(0x4C)  # "L"
 COMMANDS = (
     COMMAND_CLOSE,
     COMMAND_CLOSE_ABS,
@@ -17,64 +18,173 @@ COMMANDS = (
     COMMAND_LINETO_ABS,
 )
 
+# byte value -> the command itself for command bytes, 0 for anything else
+_COMMAND_TABLE = bytearray(256)
+for _command in COMMANDS:
+    _COMMAND_TABLE[_command] = _command
+del _command
 
-def _convert_command_args(command_args):
-    result = []
-    prev_x = 0
-    prev_y = 0
-    for i, value in enumerate(command_args):
-        if i % 2 == 0:
-            result.append(prev_x + value)
-            prev_x = prev_x + value
-        else:
-            result.append(prev_y + value)
-            prev_y = prev_y + value
-    return result
+# layout of the parser state array shared between _parse() calls
+_STATE_POSITION_X = const(0)
+_STATE_POSITION_Y = const(1)
+_STATE_POSITION_COUNTER = const(2)
+_STATE_ARGS_COUNTER = const(3)
+_STATE_COMMAND = const(4)
+_STATE_ACC = const(5)
+_STATE_NEG = const(6)
+_STATE_IN_NUM = const(7)
+_STATE_SIZE = const(8)
+
+# maximum number of coordinates (x and y values) in one subpath
+_COMMAND_ARGS_LEN = const(100)
+
+# allocated by the first draw() call and then reused, so importing only
+# draw_svgbin() doesn't pay for them
+_COMMAND_ARGS = None
+# fbuf.poly gets a slice of it bounded to the parsed coordinates
+_COMMAND_ARGS_MV = None
+_STATE = None
+# file contents are read in chunks of this size; the parser state survives
+# between chunks, so bigger files just take several reads
+_FILE_BUF_SIZE = const(4096)
+_FILE_BUF = None
+
+
+@micropython.viper
+def _convert_command_args(buf: ptr16, n: int):
+    # turns relative (x, y) offsets into absolute coordinates in place
+    px = 0
+    py = 0
+    i = 0
+    while i < n:
+        px += int(buf[i])
+        buf[i] = px
+        i += 1
+        py += int(buf[i])
+        buf[i] = py
+        i += 1
+
+
+@micropython.viper
+def _parse(data: ptr8, i: int, n: int, command_args: ptr16, state: ptr32) -> int:
+    # parses data[i:n] until a close command, which is left for the caller;
+    # returns the index of the close command or n if the data is exhausted
+    command_table = ptr8(_COMMAND_TABLE)
+    command = state[_STATE_COMMAND]
+    acc = state[_STATE_ACC]
+    neg = state[_STATE_NEG]
+    in_num = state[_STATE_IN_NUM]
+    position_counter = state[_STATE_POSITION_COUNTER]
+    command_args_counter = state[_STATE_ARGS_COUNTER]
+
+    while i < n:
+        b = data[i]
+        if b >= 0x30 and b <= 0x39:  # "0".."9"
+            acc = acc * 10 + (b - 0x30)
+            in_num = 1
+            i += 1
+            continue
+
+        # any other byte terminates the number being parsed
+        if in_num:
+            if neg:
+                acc = 0 - acc
+            if command == COMMAND_MOVE_ABS:
+                if position_counter < 2:
+                    state[_STATE_POSITION_X + position_counter] = acc
+                    position_counter += 1
+            elif command == COMMAND_LINETO or command == COMMAND_LINETO_ABS:
+                # keep counting past the end so draw() can report the overflow
+                if command_args_counter < _COMMAND_ARGS_LEN:
+                    command_args[command_args_counter] = acc
+                command_args_counter += 1
+        acc = 0
+        neg = 0
+        in_num = 0
+
+        if b == 0x2D:  # "-" also starts the next number: "3-4" is 3, -4
+            neg = 1
+        elif command_table[b]:
+            if b == COMMAND_CLOSE or b == COMMAND_CLOSE_ABS:
+                break
+            command = b
+        i += 1
+
+    state[_STATE_COMMAND] = command
+    state[_STATE_ACC] = acc
+    state[_STATE_NEG] = neg
+    state[_STATE_IN_NUM] = in_num
+    state[_STATE_POSITION_COUNTER] = position_counter
+    state[_STATE_ARGS_COUNTER] = command_args_counter
+    return i
+
+
+def _allocate_buffers():
+    global _COMMAND_ARGS, _COMMAND_ARGS_MV, _STATE, _FILE_BUF
+    _COMMAND_ARGS = array.array("h", b"\x00" * (2 * _COMMAND_ARGS_LEN))
+    _COMMAND_ARGS_MV = memoryview(_COMMAND_ARGS)
+    _STATE = array.array("i", [0] * _STATE_SIZE)
+    _FILE_BUF = bytearray(_FILE_BUF_SIZE)
 
 
 def draw(svgpathfile, fbuf, color, offset_x=0, offset_y=0):
-    command = b""
-    int_buf = b""
-    command_args = [0] * 100
-    position = [0, 0]
-    position_counter = 0
-    command_args_counter = 0
+    if _FILE_BUF is None:
+        _allocate_buffers()
+    command_args = _COMMAND_ARGS
+    command_args_mv = _COMMAND_ARGS_MV
+    state = _STATE
+    for k in range(_STATE_SIZE):
+        state[k] = 0
 
+    data = _FILE_BUF
     with open(svgpathfile, "rb") as infile:
         while True:
-            byte_s = infile.read(1)
-            if not byte_s:
+            n = infile.readinto(data)
+            if not n:
                 break
-            if byte_s in COMMANDS:
-                if byte_s == COMMAND_CLOSE or byte_s == COMMAND_CLOSE_ABS:
-                    if command == COMMAND_LINETO:
-                        command_args = _convert_command_args(command_args)
-                    fbuf.poly(
-                        position[0] + offset_x,
-                        position[1] + offset_y,
-                        array.array("h", command_args),
-                        color,
-                        True,
-                    )
-                    position_counter = 0
-                    command_args_counter = 0
-                    gc.collect()
-                command = byte_s
-                continue
-
-            if byte_s == b"," or byte_s == b" ":
-                if int_buf != b"":
-                    value = int(int_buf)
-                    int_buf = b""
-                    if command == COMMAND_MOVE_ABS:
-                        position[position_counter] = value
-                        position_counter += 1
-                    if command == COMMAND_LINETO:
-                        command_args[command_args_counter] = value
-                        command_args_counter += 1
-                    if command == COMMAND_LINETO_ABS:
-                        command_args[command_args_counter] = value
-                        command_args_counter += 1
-                continue
-            int_buf += byte_s
+
+            i = 0
+            while i < n:
+                i = _parse(data, i, n, command_args, state)
+                if i == n:
+                    break
+
+                # close command: draw the collected subpath
+                if state[_STATE_ARGS_COUNTER] > _COMMAND_ARGS_LEN:
+                    raise ValueError("subpath has more than 100 coordinates")
+                if state[_STATE_COMMAND] == COMMAND_LINETO:
+                    _convert_command_args(command_args, state[_STATE_ARGS_COUNTER])
+                fbuf.poly(
+                    state[_STATE_POSITION_X] + offset_x,
+                    state[_STATE_POSITION_Y] + offset_y,
+                    command_args_mv[: state[_STATE_ARGS_COUNTER]],
+                    color,
+                    True,
+                )
+                state[_STATE_POSITION_COUNTER] = 0
+                state[_STATE_ARGS_COUNTER] = 0
+                state[_STATE_COMMAND] = data[i]
+                i += 1
+    return
+
+
+def draw_svgbin(svgbinfile, fbuf, color, offset_x=0, offset_y=0):
+    # draws a path precompiled with compile_svgpath.py: records of int16
+    # words x, y, n followed by n coordinates, passed to fbuf.poly as-is
+    with open(svgbinfile, "rb") as infile:
+        data = array.array("h", infile.read())
+    words = memoryview(data)
+
+    i = 0
+    n = len(data)
+    while i < n:
+        count = data[i + 2]
+        fbuf.poly(
+            data[i] + offset_x,
+            data[i + 1] + offset_y,
+            words[i + 3 : i + 3 + count],
+            color,
+            True,
+        )
+        i += 3 + count
     return
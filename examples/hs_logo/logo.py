@@ -2,11 +2,14 @@ import array
 
 
 def _build_array(data):
-    result = []
+    # filled in place, so no intermediate list is built at import time
+    result = array.array("h", bytes(4 * len(data)))
+    i = 0
     for x, y in data:
-        result.append(x)
-        result.append(y)
-    return array.array("h", result)
+        result[i] = x
+        result[i + 1] = y
+        i += 2
+    return result
 
 
 PATH_S = _build_array(
@@ -1,8 +1,32 @@
+import framebuf
 import micropython
 import utime
 from vga_driver import TinyVgaDriver
 from logo import PATH_H, PATH_S, PATH_L, PATH_D, PATH_Z
-from draw_svg_path import draw as drawsvg
+from draw_svg_path import draw_svgbin
+
+
+_TILES = None
+
+
+def _get_tiles(vga, size, ell_offset, ell_r):
+    # grid cells (plain square and square with a hole) are rasterised once
+    # into small framebuffers and then only blitted
+    global _TILES
+    if _TILES is None:
+        tiles = []
+        for hole in (False, True):
+            tile = framebuf.FrameBuffer(
+                bytearray((size + 7) // 8 * size), size, size, framebuf.MONO_HLSB
+            )
+            tile.fill(vga.COLOR_RED)
+            if hole:
+                tile.ellipse(
+                    ell_offset, ell_offset, ell_r, ell_r, vga.COLOR_BLACK, True
+                )
+            tiles.append(tile)
+        _TILES = tuple(tiles)
+    return _TILES
 
 
 def draw_logo(vga, fbuf, offset_x=120, offset_y=40):
@@ -13,34 +37,20 @@ def draw_logo(vga, fbuf, offset_x=120, offset_y=40):
     ell_margin = 8
     radius = 52
     ell_r = radius
+    step = small_square_size + margin
+    xs = [margin + i * step + offset_x for i in range(3)]
+    ys = [margin + j * step + offset_y for j in range(3)]
+    ell_offset = ell_margin + ell_r
+    tile_full, tile_hole = _get_tiles(vga, small_square_size, ell_offset, ell_r)
+
     fbuf.rect(offset_x, offset_y, logo_size, logo_size, vga.COLOR_BLACK, True)
     for j in range(3):
+        y = ys[j]
         for i in range(3):
-            fbuf.rect(
-                margin + i * (small_square_size + margin) + offset_x,
-                margin + j * (small_square_size + margin) + offset_y,
-                small_square_size,
-                small_square_size,
-                vga.COLOR_RED,
-                True,
-            )
             if j == 2 or (i == 1 and j == 0) or (i == 2 and j == 1):
-                fbuf.ellipse(
-                    margin
-                    + ell_margin
-                    + i * (small_square_size + margin)
-                    + ell_r
-                    + offset_x,
-                    margin
-                    + ell_margin
-                    + j * (small_square_size + margin)
-                    + ell_r
-                    + offset_y,
-                    ell_r,
-                    ell_r,
-                    vga.COLOR_BLACK,
-                    True,
-                )
+                fbuf.blit(tile_hole, xs[i], y)
+            else:
+                fbuf.blit(tile_full, xs[i], y)
     letters = (
         (1, 0, PATH_H),
         (2, 1, PATH_S),
@@ -48,19 +58,11 @@ def draw_logo(vga, fbuf, offset_x=120, offset_y=40):
         (1, 2, PATH_D),
         (2, 2, PATH_Z),
     )
+    letter_offset = ell_margin + radius // 2
     for i, j, letter in letters:
         fbuf.poly(
-            margin
-            + ell_margin
-            + i * (small_square_size + margin)
-            + radius // 2
-            + offset_x
-            + 1,
-            margin
-            + ell_margin
-            + j * (small_square_size + margin)
-            + radius // 2
-            + offset_y,
+            xs[i] + letter_offset + 1,
+            ys[j] + letter_offset,
             letter,
             vga.COLOR_RED,
             True,
@@ -81,8 +83,8 @@ def main():
         fbuf.text("Hackerspace Lodz - pico-vga-driver", 180, 16, vga.COLOR_BLACK)
         draw_logo(vga, fbuf, offset_x, offset_y)
         print(micropython.mem_info())
-        drawsvg(
-            "qrlink.svgpath",
+        draw_svgbin(
+            "qrlink.svgbin",
             fbuf,
             vga.COLOR_BLACK,
             offset_x + 121 + 6 + 6 + 2,
@@ -6,17 +6,22 @@ from vga_driver import TinyVgaDriver
 
 
 def main():
-    vga = TinyVgaDriver(debug=True)
+    vga = TinyVgaDriver(debug=True, double_buffering=True)
     print(micropython.mem_info())
     vga.start_synchronisation()
     print(micropython.mem_info())
 
+    # draw both frames once, then just flip between them
+    vga.fill_fast(vga.COLOR_RED)
+    vga.present()
+    vga.fill_fast(vga.COLOR_BLACK)
+
     for i in range(4):
-        vga.fbuf.fill(vga.COLOR_RED)
         utime.sleep_ms(500)
         print(i)
-        vga.fbuf.fill(vga.COLOR_BLACK)
+        vga.present()
         utime.sleep_ms(500)
+        vga.present()
 
     utime.sleep_ms(10000)
     vga.stop_synchronisation()
@@ -9,6 +9,11 @@ class TinyVgaDriverTestCase(unittest.TestCase):
     def test__driver_initialization(self):
         vga = TinyVgaDriver()
 
+    def test__driver_initialization_with_double_buffering(self):
+        vga = TinyVgaDriver(double_buffering=True)
+        self.assertTrue(vga.double_buffering)
+        self.assertIsNone(vga.get_back_buffer())
+
 
 if __name__ == "__main__":
     unittest.main()